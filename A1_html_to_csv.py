@@ -1,7 +1,57 @@
 #!/usr/bin/env python3
 import os
+import sys
 import csv
-from bs4 import BeautifulSoup
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from bs4 import BeautifulSoup, FeatureNotFound, NavigableString, Tag
+
+# Class names that usually hold a column's value, tried in this order
+COMMON_CLASSES = ['name', 'title', 'company', 'role', 'position']
+
+def parse_html(markup):
+    """Parse HTML bytes with lxml, falling back to the built-in parser if it's missing."""
+    try:
+        return BeautifulSoup(markup, 'lxml', from_encoding='utf-8')
+    except FeatureNotFound:
+        return BeautifulSoup(markup, 'html.parser', from_encoding='utf-8')
+
+def load_html(input_file):
+    """Parse the input file from its raw bytes, leaving the decode to the parser."""
+    with open(input_file, 'rb') as f:
+        return parse_html(f.read())
+
+def confirm(question):
+    """Ask a Y/N question; set EXTRACTOR_YES or pass --yes to answer yes without asking."""
+    print(question)
+    if os.environ.get('EXTRACTOR_YES') or '--yes' in sys.argv[1:]:
+        print("Y (confirmed automatically)")
+        return True
+    return input().strip().upper() == 'Y'
+
+def class_keys(node):
+    """Return the class names find(class_=...) would match node by."""
+    # An element matches a class it carries or its whole space-joined class
+    # attribute; non-tags and tags without a class attribute match nothing
+    if not isinstance(node, Tag):
+        return ()
+    classes = node.get('class')
+    if classes is None:
+        return ()
+    return [*classes, ' '.join(classes)]
+
+def find_first_by_class(soup, class_names):
+    """Find each class name's first element, as find(class_=...) would, in one walk."""
+    # The walk stops once every name has been found
+    wanted = set(class_names)
+    first_hits = {}
+    for node in soup.descendants:
+        for name in wanted.intersection(class_keys(node)):
+            first_hits[name] = node
+            wanted.discard(name)
+            if not wanted:
+                return first_hits
+    return first_hits
 
 def get_user_input(soup):
     """Get column names and first row values from user."""
@@ -10,14 +60,10 @@ def get_user_input(soup):
     
     # Check if these column names exist as class names
     first_values = {}
-    found_classes = True
-    for col in column_names:
-        elem = soup.find(class_=col)  # Check any tag with this class
-        if elem:
-            first_values[col] = elem.get_text(strip=True)
-        else:
-            found_classes = False
-            break
+    first_hits = find_first_by_class(soup, column_names)
+    found_classes = all(col in first_hits for col in column_names)
+    if found_classes:
+        first_values = {col: first_hits[col].get_text(strip=True) for col in column_names}
     
     # If we found all matching classes, ask user if this is correct
     if found_classes and first_values:
@@ -25,88 +71,151 @@ def get_user_input(soup):
         for col, value in first_values.items():
             print(f"{col}: {value}")
         
-        print("\nIs this the correct mapping? (Y/N)")
-        if input().strip().upper() == 'Y':
+        if confirm("\nIs this the correct mapping? (Y/N)"):
             return column_names, list(first_values.values()), True
     
-    # If no matches or user said no, proceed with manual input
-    print("\nFor each column, enter the value from the first row:")
-    sample_values = []
-    for col in column_names:
+    # If no matches or user said no, proceed with manual input. An empty
+    # first answer switches to entering the whole row on one line.
+    print("\nFor each column, enter the value from the first row")
+    print("(or press Enter to type the whole row on one comma-separated line):")
+    first_value = input(f"{column_names[0]}: ").strip()
+    if not first_value:
+        print("Enter the values in column order, quoting any value that contains a comma:")
+        while True:
+            values = [value.strip() for value in next(csv.reader([input()], skipinitialspace=True), [])]
+            if len(values) == len(column_names):
+                return column_names, values, False
+            print(f"Expected {len(column_names)} values but got {len(values)}, please try again:")
+    
+    sample_values = [first_value]
+    for col in column_names[1:]:
         value = input(f"{col}: ").strip()
         sample_values.append(value)
     
     return column_names, sample_values, False
 
+def index_by_class(soup, class_names):
+    """Collect the elements matching each class name in document order, in one walk."""
+    wanted = set(class_names)
+    by_class = {name: [] for name in wanted}
+    for node in soup.descendants:
+        for name in wanted.intersection(class_keys(node)):
+            by_class[name].append(node)
+    return by_class
+
+def index_first_matches(matches):
+    """Map the id of every element to the first of the matches below it."""
+    # Matches come in document order, so the first one recorded for an
+    # ancestor is what ancestor.find() for the same query returns. Once an
+    # ancestor is recorded, all of its own ancestors are too.
+    first_below = {}
+    for elem in matches:
+        for ancestor in elem.parents:
+            if id(ancestor) in first_below:
+                break
+            first_below[id(ancestor)] = elem
+    return first_below
+
 def extract_data_by_class(soup, column_names):
     """Extract data using class names as column names."""
     data = []
     
+    # Index each column's matches by the elements containing them, so finding
+    # a row's container needs no searching
+    matches = index_by_class(soup, column_names)
+    first_below = {col: index_first_matches(matches[col]) for col in column_names}
+    
     # Find all instances of the first column to determine number of rows
     first_col = column_names[0]
-    first_elements = soup.find_all(class_=first_col)
+    first_elements = matches[first_col]
+    empty_row = dict.fromkeys(column_names, '')
+    
+    # Rows that settle on the same container read the same elements, so
+    # each element's text is only extracted once
+    texts = {}
     
     # For each first column element
     for first_elem in first_elements:
-        row = {}
+        row = empty_row.copy()
         has_data = False
         
         # Find the common parent that contains all columns
         parent = first_elem.parent
         while parent and parent.name != 'body':
-            # Check if this parent contains elements for all columns
-            found_all = True
-            for col in column_names:
-                if not parent.find(class_=col):
-                    found_all = False
-                    break
-            if found_all:
+            if all(id(parent) in first_below[col] for col in column_names):
                 break
             parent = parent.parent
         
         if parent:
             # Extract values for each column from this parent
             for col in column_names:
-                elem = parent.find(class_=col)
+                elem = first_below[col].get(id(parent))
                 if elem:
-                    value = elem.get_text(strip=True)
+                    value = texts.get(id(elem))
+                    if value is None:
+                        value = texts[id(elem)] = elem.get_text(strip=True)
                     if value:
                         row[col] = value
                         has_data = True
-                else:
-                    row[col] = ''
             
             if has_data:
                 data.append(row)
     
     return data
 
-def find_pattern(soup, value):
+def build_lookup_index(soup):
+    """Walk the document once, indexing the values find_pattern looks up."""
+    # Keep the first match in document order for each key, like soup.find().
+    # Text nodes map straight to their parent element, which is what's used.
+    # Elements with one of the common classes are keyed by their single
+    # string, matching soup.find(class_=..., string=...).
+    texts = {}
+    alts = {}
+    classed = {class_name: {} for class_name in COMMON_CLASSES}
+    for node in soup.descendants:
+        if isinstance(node, NavigableString):
+            if node:
+                texts.setdefault(node.strip(), node.parent)
+        elif isinstance(node, Tag):
+            if node.name == 'img':
+                alt = node.get('alt')
+                if alt:
+                    alts.setdefault(alt.strip(), node)
+            for class_name in node.get('class', ()):
+                if class_name in classed:
+                    string = node.string
+                    if string:
+                        classed[class_name].setdefault(string.strip(), node)
+    return {'text': texts, 'alt': alts, 'class': classed}
+
+def text_parts(elem):
+    """Return the stripped, non-empty text pieces of an element, split at tags."""
+    return list(elem.stripped_strings)
+
+def find_pattern(value, lookup):
     """Find how to extract a value from HTML."""
+    target = value.strip()
+    
     # First try to find elements with class names that might match our columns
-    common_classes = ['name', 'title', 'company', 'role', 'position']
-    for class_name in common_classes:
-        elem = soup.find(class_=class_name, string=lambda x: x and value.strip() == x.strip())
-        if elem:
+    for class_name in COMMON_CLASSES:
+        elem = lookup['class'][class_name].get(target)
+        if elem is not None:
             return ('text', elem.name, {'class': class_name}, None)
     
     # Try exact text match in any element
-    elem = soup.find(string=lambda x: x and value.strip() == x.strip())
-    if elem:
-        # Get the parent element
-        parent = elem.parent
+    parent = lookup['text'].get(target)
+    if parent is not None:
         # Get any class names
         classes = parent.get('class', [])
         class_str = classes[0] if classes else None
         
-        # Get the full text to see if it contains line breaks
-        full_text = parent.get_text(separator='<br>', strip=True)
-        parts = full_text.split('<br>')
+        # Split the text at tag boundaries to see if it contains line breaks
+        parts = text_parts(parent)
         
         if len(parts) > 1:
             # If text has line breaks, find which part contains our value
             try:
-                index = next(i for i, part in enumerate(parts) if value.strip() == part.strip())
+                index = next(i for i, part in enumerate(parts) if target == part.strip())
                 return ('text_with_breaks', parent.name, {'class': class_str}, index)
             except StopIteration:
                 pass
@@ -115,130 +224,154 @@ def find_pattern(soup, value):
         return ('text', parent.name, {'class': class_str}, None)
     
     # Try alt attributes
-    img = soup.find('img', alt=lambda x: x and value.strip() == x.strip())
-    if img:
+    if target in lookup['alt']:
         return ('alt', 'img', None, None)
     
     return (None, None, None, None)
 
-def get_value(elem, method, index=None):
-    """Extract value from element based on pattern."""
-    if not elem:
-        return ''
-        
+def make_extractor(method, index=None):
+    """Build the function that pulls a pattern's value out of an element."""
+    # Every method normalizes spaces - replacing runs of whitespace with one space
     if method == 'alt':
-        value = elem.get('alt', '').strip()
-    elif method == 'text_with_breaks':
-        parts = elem.get_text(separator='<br>', strip=True).split('<br>')
-        if index is not None and index < len(parts):
-            value = parts[index].strip()
-        else:
-            value = ''
+        def extract(elem):
+            return ' '.join(elem.get('alt', '').split())
+    elif method == 'text_with_breaks' and index is not None:
+        def extract(elem):
+            # Only read as far into the text as the part we want
+            part = next(islice(elem.stripped_strings, index, None), '')
+            return ' '.join(part.split())
     elif method == 'text':
-        value = elem.get_text(strip=True)
+        def extract(elem):
+            return ' '.join(elem.get_text(strip=True).split())
     else:
-        value = ''
-    
-    # Normalize spaces - replace multiple spaces with single space
-    return ' '.join(value.split())
+        def extract(elem):
+            return ''
+    return extract
+
+def matching_columns(elem, by_tag):
+    """Return the columns whose (tag, class, attribute) pattern elem matches."""
+    wanted = by_tag.get(elem.name)
+    if not wanted:
+        return ()
+    classes = elem.get('class', ())
+    return [
+        col for col, class_name, attr_name in wanted
+        if (class_name is None or class_name in classes)
+        and (attr_name is None or attr_name in elem.attrs)
+    ]
+
+def subtree_ends(tags):
+    """For tags in document order, return the index just past each one's last descendant."""
+    ends = [len(tags)] * len(tags)
+    open_tags = []
+    for i, tag in enumerate(tags):
+        # Every open tag that isn't this one's parent has ended
+        parent = tag.parent
+        while open_tags and tags[open_tags[-1]] is not parent:
+            ends[open_tags.pop()] = i
+        open_tags.append(i)
+    return ends
 
 def extract_data_by_pattern(soup, patterns, column_names):
     """Extract data using discovered patterns."""
-    data = []
+    # Rows keyed by their values, so duplicates are dropped as they're found
+    unique_rows = {}
     
-    # Find all potential containers that have the details class
-    containers = soup.find_all(class_='details')
-    if not containers:  # Fall back to all elements if no details class found
-        containers = soup.find_all()
+    # Group the columns by the tag their pattern matches, with the class (or
+    # attribute) the tag must carry, if any
+    by_tag = {}
+    for col, (method, tag, attrs, index) in patterns.items():
+        if method == 'alt':
+            by_tag.setdefault('img', []).append((col, None, 'alt'))
+        elif method in ['text', 'text_with_breaks']:
+            class_name = attrs['class'] if attrs and 'class' in attrs and attrs['class'] else None
+            by_tag.setdefault(tag, []).append((col, class_name, None))
     
-    # Process each container
-    for container in containers:
-        row = {}
-        has_data = False
+    # Find every column's matches in one walk, noting each one's position in
+    # document order. A tag's descendants are the tags after it up to its
+    # subtree end, so any container's matches are a run of these lists.
+    all_tags = soup.find_all(True)
+    ends = subtree_ends(all_tags)
+    found_at = {col: [] for col in patterns}
+    found = {col: [] for col in patterns}
+    is_match = [False] * len(all_tags)
+    for i, elem in enumerate(all_tags):
+        for col in matching_columns(elem, by_tag):
+            found_at[col].append(i)
+            found[col].append(elem)
+            is_match[i] = True
+    
+    # Position of the first match after each tag, so containers holding no
+    # match for any column can be skipped without searching
+    next_match = [len(all_tags)] * len(all_tags)
+    following = len(all_tags)
+    for i in range(len(all_tags) - 1, -1, -1):
+        next_match[i] = following
+        if is_match[i]:
+            following = i
+    
+    # Find all potential containers that have the details class, falling back
+    # to all elements if there are none
+    containers = [i for i, tag in enumerate(all_tags) if 'details' in tag.get('class', ())]
+    if not containers:
+        containers = range(len(all_tags))
+    
+    # Build each column's value extractor once
+    extractors = {
+        col: make_extractor(method, index)
+        for col, (method, tag, attrs, index) in patterns.items()
+        if method
+    }
+    
+    # Elements nested in several containers match once per container, so
+    # each column's values are remembered alongside its matches
+    values = {col: [None] * len(found[col]) for col in patterns}
+    
+    # Process each container, starting every row with all columns blank
+    empty_row = dict.fromkeys(column_names, '')
+    for start in containers:
+        stop = ends[start]
+        if next_match[start] >= stop:
+            continue
+        row = empty_row.copy()
+        used_values = set()
         
         # Try to extract each column's value
         for col, (method, tag, attrs, index) in patterns.items():
             if not method:
                 continue
             
+            # This container's matches for the column, in document order
+            first = bisect_right(found_at[col], start)
+            last = bisect_left(found_at[col], stop, first)
+            
             value = None
             
             # First try to find the value in this container
             if method == 'alt':
-                img = container.find('img', alt=True)
-                if img:
-                    value = get_value(img, method, index)
+                if first < last:
+                    value = extractors[col](found[col][first])
             elif method in ['text', 'text_with_breaks']:
-                # Find all matching tags in this container with the specific class if provided
-                if attrs and 'class' in attrs and attrs['class']:
-                    elems = container.find_all(tag, class_=attrs['class'])
-                else:
-                    elems = container.find_all(tag)
-                    
-                for elem in elems:
-                    test_value = get_value(elem, method, index)
+                # Walk matching tags in this container (with the class if provided)
+                known = values[col]
+                for i in range(first, last):
+                    test_value = known[i]
+                    if test_value is None:
+                        test_value = known[i] = extractors[col](found[col][i])
                     # Only use this value if it's not already in our row
-                    if test_value and test_value not in row.values():
+                    if test_value and test_value not in used_values:
                         value = test_value
                         break
             
             if value:
                 row[col] = value
-                has_data = True
+                used_values.add(value)
         
-        # Add row if we found any data
-        if has_data:
-            # Fill in any missing columns
-            for col in column_names:
-                if col not in row:
-                    row[col] = ''
-            data.append(row)
-    
-    # Remove duplicate rows
-    unique_data = []
-    seen = set()
-    for row in data:
-        # Convert row to tuple for hashability
-        row_tuple = tuple(row[col] for col in column_names)
-        if row_tuple not in seen and any(row_tuple):
-            seen.add(row_tuple)
-            unique_data.append(row)
+        # Add row if we found any data, keeping only its first occurrence
+        if used_values:
+            unique_rows.setdefault(tuple(row[col] for col in column_names), row)
     
-    return unique_data
-
-def clean_csv(filename, column_names):
-    """Clean the CSV file by combining duplicate rows."""
-    # Read existing data
-    rows = []
-    with open(filename, 'r', newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-
-    # Group rows by first column value
-    grouped_rows = {}
-    for row in rows:
-        key = row[column_names[0]].strip()
-        if not key:  # Skip rows with no first column value
-            continue
-            
-        if key not in grouped_rows:
-            grouped_rows[key] = row
-        else:
-            # Combine with existing row - take non-empty values
-            for col in column_names:
-                if not grouped_rows[key][col].strip() and row[col].strip():
-                    grouped_rows[key][col] = row[col]
-
-    # Convert back to list
-    cleaned_rows = list(grouped_rows.values())
-
-    # Write back cleaned data
-    with open(filename, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=column_names)
-        writer.writeheader()
-        writer.writerows(cleaned_rows)
-
-    return len(cleaned_rows)
+    return list(unique_rows.values())
 
 def main():
     # Get input file
@@ -248,8 +381,7 @@ def main():
         return
     
     # Load HTML
-    with open(input_file, 'r', encoding='utf-8') as f:
-        soup = BeautifulSoup(f.read(), 'html.parser')
+    soup = load_html(input_file)
     
     # Get user input and check if using class-based extraction
     column_names, sample_values, use_classes = get_user_input(soup)
@@ -262,8 +394,9 @@ def main():
         # Find patterns for each column
         print("\nAnalyzing patterns...")
         patterns = {}
+        lookup = build_lookup_index(soup)
         for col, value in zip(column_names, sample_values):
-            method, tag, attrs, index = find_pattern(soup, value)
+            method, tag, attrs, index = find_pattern(value, lookup)
             if method:
                 attrs_str = f" with class={attrs['class']}" if attrs and 'class' in attrs and attrs['class'] else ""
                 print(f"Found pattern for '{col}': {method} using {tag}{attrs_str}" + (f" index {index}" if index is not None else ""))
@@ -273,22 +406,9 @@ def main():
                 patterns[col] = (None, None, None, None)
         data = extract_data_by_pattern(soup, patterns, column_names)
     
-    # Save to CSV
-    output_file = "html_output.csv"
-    with open(output_file, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=column_names)
-        writer.writeheader()
-        writer.writerows(data)
-    
-    # Now clean up the output file
-    # Read the CSV
-    with open(output_file, 'r', newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-    
     # Combine duplicate rows
     combined = {}
-    for row in rows:
+    for row in data:
         name = row[column_names[0]].strip()
         if not name:  # Skip rows with no name
             continue
@@ -301,11 +421,12 @@ def main():
         else:
             combined[name] = row
     
-    # Write back only the combined rows
-    with open(output_file, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=column_names)
-        writer.writeheader()
-        writer.writerows(combined.values())
+    # Save only the combined rows to CSV
+    output_file = "html_output.csv"
+    with open(output_file, 'w', newline='', encoding='utf-8', buffering=1 << 20) as f:
+        writer = csv.writer(f)
+        writer.writerow(column_names)
+        writer.writerows([row.get(col, '') for col in column_names] for row in combined.values())
     
     print(f"\nExtracted {len(combined)} unique rows to {output_file}")
 
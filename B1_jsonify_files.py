@@ -1,20 +1,30 @@
 import os
 
 def rename_files():
-    # Get all files in current directory
-    files = os.listdir('.')
+    # Filter for files without dots in their names (except the script itself).
+    # scandir entries carry the file type, so this avoids a stat() per file,
+    # and the cheap name checks run before is_file(). The scan finishes before
+    # any rename so the listing isn't affected by the renames themselves.
+    with os.scandir('.') as entries:
+        files_to_rename = [
+            e.name for e in entries
+            if '.' not in e.name and e.name != 'rename_files.py' and e.is_file()
+        ]
     
-    # Filter for files without dots in their names (except the script itself)
-    files_to_rename = [f for f in files if os.path.isfile(f) and '.' not in f and f != 'rename_files.py']
-    
-    # Rename each file
+    # Rename each file, collecting errors so stdout isn't written per file
+    renamed = 0
+    errors = []
     for file in files_to_rename:
         new_name = f"{file}.json"
         try:
-            os.rename(file, new_name)
-            print(f"Renamed {file} to {new_name}")
+            os.replace(file, new_name)
+            renamed += 1
         except Exception as e:
-            print(f"Error renaming {file}: {str(e)}")
+            errors.append(f"Error renaming {file}: {str(e)}")
+    
+    if errors:
+        print("\n".join(errors))
+    print(f"Renamed {renamed} of {len(files_to_rename)} files to .json")
 
 if __name__ == "__main__":
     rename_files() 
\ No newline at end of file
@@ -1,12 +1,22 @@
 import json
 import pandas as pd
 import logging
-from typing import List, Dict, Any, Set
+from typing import List, Dict, Any, NamedTuple, Optional, Set, Tuple
 import argparse
-import re
 import glob
+import mmap
 import os
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -15,35 +25,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def extract_field_name(full_path: str) -> str:
-    """
-    Extract a user-friendly field name from a full JSON path
-    
-    Args:
-        full_path: The full path to the field in dot notation
-        
-    Returns:
-        A simplified field name
-    """
-    # Try to extract the actual field name from the path
-    # First check if it's an array index pattern
-    array_pattern = r'\.(\w+)\[\d+\]\.(\w+)$'
-    match = re.search(array_pattern, full_path)
-    if match:
-        collection, field = match.groups()
-        return f"{collection}_{field}"
-    
-    # Otherwise just get the last part after the dot
-    parts = full_path.split('.')
-    if len(parts) > 0:
-        return parts[-1]
-    
-    return full_path
+OUTPUT_FORMATS = ('csv', 'parquet', 'feather')
+
+# Files larger than this are streamed with ijson (when installed) rather than
+# loaded into memory whole
+STREAMING_THRESHOLD = 100 * 1024 * 1024
 
 def flatten_json(nested_json: Any, prefix: str = '') -> Dict:
     """
     Flatten a nested JSON structure into a single-level dictionary.
     
+    Walks the structure with an explicit stack instead of recursing, so deep
+    documents don't hit the recursion limit and every value is written
+    straight into one output dict.
+    
     Args:
         nested_json: The nested JSON structure to flatten
         prefix: Optional prefix for flattened keys
@@ -52,127 +47,99 @@ def flatten_json(nested_json: Any, prefix: str = '') -> Dict:
         A flattened dictionary with dot-notation keys
     """
     flattened = {}
+    stack = [(nested_json, prefix)]
     
-    # Handle different types of data
-    if isinstance(nested_json, dict):
-        for key, value in nested_json.items():
-            new_key = f"{prefix}.{key}" if prefix else key
-            if isinstance(value, (dict, list)):
-                flattened.update(flatten_json(value, new_key))
-            else:
-                flattened[new_key] = value
-                
-    elif isinstance(nested_json, list):
-        for i, item in enumerate(nested_json):
-            new_key = f"{prefix}[{i}]"
-            if isinstance(item, (dict, list)):
-                flattened.update(flatten_json(item, new_key))
-            else:
-                flattened[new_key] = item
-    else:
-        flattened[prefix] = nested_json
+    while stack:
+        node, path = stack.pop()
+        
+        # Handle different types of data. Children are pushed in reverse so
+        # they're popped (and written) in their original order.
+        if isinstance(node, dict):
+            stack.extend(reversed([
+                (value, f"{path}.{key}" if path else key)
+                for key, value in node.items()
+            ]))
+        elif isinstance(node, list):
+            stack.extend(reversed([
+                (item, f"{path}[{i}]")
+                for i, item in enumerate(node)
+            ]))
+        else:
+            flattened[path] = node
         
     return flattened
 
-def find_array_fields(data: Any) -> List[str]:
+def collect_candidates(data: Any) -> List[Tuple[str, List[Any], Set[str]]]:
     """
-    Find arrays in the JSON structure that might contain rows of data
+    Find arrays of objects that might contain rows of data, in a single pass
+    
+    Each candidate carries the array itself along with its path, so callers
+    never have to navigate back to it from the path string. Arrays nested
+    inside a candidate's rows are not searched.
     
     Args:
         data: The JSON data structure
         
     Returns:
-        List of field paths to arrays that contain dictionaries
+        List of (path, array, field names) tuples in document order, where
+        the field names are the union of keys across the array's objects
     """
-    array_fields = []
-    
-    def search_arrays(obj, prefix=""):
+    candidates = []
+    
+    # Depth-first walk with an explicit stack; children are pushed in reverse
+    # so arrays are found in document order. The flag marks values reached
+    # through a dict key, which are the only ones treated as row arrays.
+    stack = [(data, "", False)]
+    while stack:
+        obj, prefix, from_key = stack.pop()
         if isinstance(obj, dict):
-            for key, value in obj.items():
-                new_prefix = f"{prefix}.{key}" if prefix else key
-                if isinstance(value, list) and value and isinstance(value[0], dict):
-                    array_fields.append(new_prefix)
-                search_arrays(value, new_prefix)
+            stack.extend(reversed([
+                (value, f"{prefix}.{key}" if prefix else key, True)
+                for key, value in obj.items()
+            ]))
         elif isinstance(obj, list):
-            for i, item in enumerate(obj):
-                search_arrays(item, f"{prefix}[{i}]")
-    
-    search_arrays(data)
-    return array_fields
+            if from_key and obj and isinstance(obj[0], dict):
+                field_names = {key for item in obj if isinstance(item, dict) for key in item}
+                candidates.append((prefix, obj, field_names))
+                # Don't descend into the rows themselves: arrays nested in a
+                # row aren't candidates for the top-level table, and skipping
+                # them keeps the walk proportional to the schema, not the data
+                continue
+            stack.extend(reversed([
+                (item, f"{prefix}[{i}]", False)
+                for i, item in enumerate(obj)
+            ]))
+    
+    return candidates
 
-def extract_common_fields(data: Any) -> Dict[str, Set[str]]:
+def restructure_array_to_columns(array: List[Any], field_names: Set[str]) -> Dict[str, List[Any]]:
     """
-    Find common field names in arrays of objects
-    
-    Args:
-        data: The JSON data structure
-        
-    Returns:
-        Dict mapping array paths to sets of field names
-    """
-    array_paths = find_array_fields(data)
-    common_fields = {}
-    
-    for path in array_paths:
-        # Navigate to the array
-        array = data
-        for part in path.split('.'):
-            if '[' in part:
-                key, idx = part.split('[')
-                idx = int(idx.rstrip(']'))
-                array = array[key][idx]
-            else:
-                array = array[part]
-        
-        # Skip if not a list
-        if not isinstance(array, list):
-            continue
-            
-        # Extract field names from each object in the array
-        field_names = set()
-        for item in array:
-            if isinstance(item, dict):
-                for key in item:
-                    field_names.add(key)
-        
-        common_fields[path] = field_names
+    Convert an array of objects into one list of values per field
     
-    return common_fields
-
-def restructure_array_to_rows(data: Any, array_path: str, field_names: Set[str]) -> List[Dict]:
-    """
-    Convert an array of objects into a list of row dictionaries
+    Building columns directly lets pandas allocate each column once instead
+    of inferring the schema from every row dictionary.
     
     Args:
-        data: The full JSON data structure
-        array_path: Path to the array to extract
+        array: The array of objects to extract
         field_names: Set of field names to extract
         
     Returns:
-        List of dictionaries representing rows for the CSV
-    """
-    rows = []
-    
-    # Navigate to the array
-    array = data
-    path_parts = array_path.split('.')
-    for part in path_parts:
-        if '[' in part:
-            key, idx = part.split('[')
-            idx = int(idx.rstrip(']'))
-            array = array[key][idx]
-        else:
-            array = array[part]
+        Dict mapping each field name to its column of values
+    """
+    # Fix the field order once (tuples iterate faster than sets) and bind
+    # each column's append up front so the per-item loop is just lookups
+    field_tuple = tuple(field_names)
+    columns = {field: [] for field in field_tuple}
+    appenders = [(field, columns[field].append) for field in field_tuple]
     
     # Extract values for each item in the array
     for item in array:
         if isinstance(item, dict):
-            row = {}
-            for field in field_names:
-                row[field] = item.get(field, None)
-            rows.append(row)
+            get = item.get
+            for field, append in appenders:
+                append(get(field))
     
-    return rows
+    return columns
 
 def smart_restructure(data: Any) -> pd.DataFrame:
     """
@@ -185,18 +152,29 @@ def smart_restructure(data: Any) -> pd.DataFrame:
     Returns:
         Pandas DataFrame with restructured data
     """
-    # First, find arrays that might contain rows of data
-    common_fields = extract_common_fields(data)
-    
-    # If we found arrays with common fields, use the one with the most fields
-    if common_fields:
-        best_array = max(common_fields.items(), key=lambda x: len(x[1]))
-        array_path, fields = best_array
+    # Large files were only scanned for their row array; stream it now
+    if isinstance(data, StreamedArray):
+        array_path = data.item_prefix.removesuffix('item').rstrip('.') or '<root>'
+        logger.info(f"Streaming array at path '{array_path}' with {len(data.fields)} fields")
+        return pd.DataFrame(stream_array_columns(data), copy=False)
+    
+    # A top-level array of objects is already the row array
+    if isinstance(data, list) and data and isinstance(data[0], dict):
+        fields = {key for item in data if isinstance(item, dict) for key in item}
+        logger.info(f"Using top-level array with {len(fields)} fields")
+        return pd.DataFrame(restructure_array_to_columns(data, fields), copy=False)
+    
+    # Otherwise, find arrays that might contain rows of data
+    candidates = collect_candidates(data)
+    
+    # If we found arrays of objects, use the one with the most fields
+    if candidates:
+        array_path, array, fields = max(candidates, key=lambda c: len(c[2]))
         
         logger.info(f"Using array at path '{array_path}' with {len(fields)} fields")
-        rows = restructure_array_to_rows(data, array_path, fields)
+        columns = restructure_array_to_columns(array, fields)
         
-        return pd.DataFrame(rows)
+        return pd.DataFrame(columns, copy=False)
     
     # If no suitable arrays found, just flatten the entire structure
     logger.info("No suitable arrays found, flattening entire structure")
@@ -210,7 +188,8 @@ def get_json_files_in_current_dir() -> List[str]:
     Returns:
         List of JSON file paths
     """
-    json_files = [f for f in os.listdir('.') if f.endswith('.json')]
+    with os.scandir('.') as entries:
+        json_files = [e.name for e in entries if e.is_file() and e.name.endswith('.json')]
     return json_files
 
 def prompt_for_files(available_files: List[str]) -> List[str]:
@@ -268,6 +247,154 @@ def prompt_for_files(available_files: List[str]) -> List[str]:
     
     return selected_files
 
+class StreamedArray(NamedTuple):
+    """A row array in a large file, to be streamed rather than loaded"""
+    file_path: str
+    item_prefix: str
+    fields: Set[str]
+
+def discover_stream_array(file_path: str) -> Optional[Tuple[str, Set[str]]]:
+    """
+    Find the row array in a JSON file from its token stream, without loading it
+    
+    Makes the same choice as smart_restructure: a top-level array of objects,
+    or else the array of objects under a key with the most fields. Arrays
+    nested inside a candidate's rows are ignored.
+    
+    Args:
+        file_path: Path to the JSON file
+        
+    Returns:
+        Tuple of (ijson prefix of the array's items, field names), or None
+        if the file has no array of objects or the choice is ambiguous
+    """
+    candidates = {}
+    # Prefixes reached by more than one value: the same key on several
+    # top-level rows, or a key named "item" or containing a dot that spells
+    # out an array's item prefix. ijson.items would yield every one of those
+    # values, so such a candidate can't be streamed.
+    seen_prefixes = set()
+    repeated_prefixes = set()
+    # One entry per open container: [is_array, reached_through_key, awaiting_first_item, is_candidate]
+    open_containers = []
+    active_prefix = None
+    active_fields = None
+    
+    with open(file_path, 'rb') as file:
+        for prefix, event, value in ijson.parse(file, use_float=True):
+            if event == 'map_key':
+                # Keys directly on the candidate's items are its fields
+                if prefix == active_prefix:
+                    active_fields.add(value)
+                value_prefix = f"{prefix}.{value}" if prefix else value
+                if value_prefix in seen_prefixes:
+                    repeated_prefixes.add(value_prefix)
+                seen_prefixes.add(value_prefix)
+                continue
+            
+            if event in ('end_map', 'end_array'):
+                if open_containers.pop()[3]:
+                    active_prefix = active_fields = None
+                continue
+            
+            # Any other event starts a value. The first item of an array
+            # decides whether that array holds rows.
+            if open_containers:
+                parent = open_containers[-1]
+                if parent[0] and parent[2]:
+                    parent[2] = False
+                    is_root = len(open_containers) == 1
+                    if event == 'start_map' and active_prefix is None and (parent[1] or is_root):
+                        parent[3] = True
+                        active_prefix = prefix
+                        active_fields = candidates.setdefault(prefix, set())
+            
+            if event == 'start_array':
+                items_prefix = f"{prefix}.item" if prefix else 'item'
+                if items_prefix in seen_prefixes:
+                    repeated_prefixes.add(items_prefix)
+                seen_prefixes.add(items_prefix)
+            
+            if event in ('start_map', 'start_array'):
+                reached_through_key = bool(open_containers) and not open_containers[-1][0]
+                open_containers.append([event == 'start_array', reached_through_key, True, False])
+    
+    if not candidates or not repeated_prefixes.isdisjoint(candidates):
+        return None
+    return max(candidates.items(), key=lambda c: len(c[1]))
+
+def stream_array_columns(streamed: StreamedArray) -> Dict[str, List[Any]]:
+    """
+    Stream a large file's row array straight into columns
+    
+    Only one row is held as a Python object at a time, so memory stays
+    proportional to the output columns rather than the whole document.
+    
+    Args:
+        streamed: The array to stream
+        
+    Returns:
+        Dict mapping each field name to its column of values
+    """
+    with open(streamed.file_path, 'rb') as file:
+        rows = ijson.items(file, streamed.item_prefix, use_float=True)
+        return restructure_array_to_columns(rows, streamed.fields)
+
+def parse_json_file(file_path: str) -> Any:
+    """
+    Parse a single JSON file
+    
+    Uses orjson over a read-only memory map when it's installed, which avoids
+    reading the file into a Python string first. Falls back to the standard
+    json module for inputs orjson rejects (e.g. a BOM or NaN values).
+    
+    Args:
+        file_path: Path to the JSON file
+        
+    Returns:
+        The parsed JSON data
+    """
+    with open(file_path, 'rb') as file:
+        # mmap can't map empty files; those fall through to json's error
+        if orjson is None or os.fstat(file.fileno()).st_size == 0:
+            return json.loads(file.read())
+        
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            try:
+                with memoryview(mm) as view:
+                    return orjson.loads(view)
+            except orjson.JSONDecodeError:
+                return json.loads(mm[:])
+
+def load_json_file(file_path: str) -> Tuple[Any, Optional[str]]:
+    """
+    Load one JSON file, reporting failures instead of raising
+    
+    Errors come back as messages for the caller to log. Very large files
+    with a row array come back as a StreamedArray instead of being loaded.
+    
+    Args:
+        file_path: Path to the JSON file
+        
+    Returns:
+        Tuple of (loaded data, None) on success or (None, error message)
+    """
+    try:
+        if ijson is not None and os.path.getsize(file_path) > STREAMING_THRESHOLD:
+            try:
+                found = discover_stream_array(file_path)
+            except ijson.JSONError:
+                return None, f"Invalid JSON in file: {file_path}"
+            if found:
+                return StreamedArray(file_path, *found), None
+        return parse_json_file(file_path), None
+    except FileNotFoundError:
+        return None, f"File not found: {file_path}"
+    except json.JSONDecodeError:
+        return None, f"Invalid JSON in file: {file_path}"
+    except Exception as e:
+        return None, f"Error reading JSON file {file_path}: {e}"
+
 def load_json_files(file_paths: List[str]) -> List[Dict]:
     """
     Load multiple JSON files
@@ -281,17 +408,12 @@ def load_json_files(file_paths: List[str]) -> List[Dict]:
     all_data = []
     
     for file_path in file_paths:
-        try:
-            with open(file_path, 'r') as file:
-                data = json.load(file)
-                all_data.append(data)
-                logger.info(f"Successfully loaded JSON file: {file_path}")
-        except FileNotFoundError:
-            logger.error(f"File not found: {file_path}")
-        except json.JSONDecodeError:
-            logger.error(f"Invalid JSON in file: {file_path}")
-        except Exception as e:
-            logger.error(f"Error reading JSON file {file_path}: {e}")
+        data, error = load_json_file(file_path)
+        if error:
+            logger.error(error)
+        else:
+            all_data.append(data)
+            logger.info(f"Successfully loaded JSON file: {file_path}")
     
     return all_data
 
@@ -307,46 +429,116 @@ def combine_dataframes(dfs: List[pd.DataFrame]) -> pd.DataFrame:
     """
     if not dfs:
         return pd.DataFrame()
-        
-    # Get the union of all columns
-    all_columns = set()
-    for df in dfs:
-        all_columns.update(df.columns)
     
-    # Add missing columns to each DataFrame
+    # concat aligns columns itself in one allocation. Columns missing from
+    # some files are cast to object first so the gaps don't upcast their
+    # values (ints to floats, for example).
+    shared_columns = set(dfs[0].columns).intersection(*(df.columns for df in dfs[1:]))
     aligned_dfs = []
     for df in dfs:
-        missing_cols = all_columns - set(df.columns)
-        for col in missing_cols:
-            df[col] = None
+        partial_columns = [col for col in df.columns if col not in shared_columns]
+        if partial_columns:
+            df = df.astype(dict.fromkeys(partial_columns, object))
         aligned_dfs.append(df)
     
     # Combine all DataFrames
-    return pd.concat(aligned_dfs, ignore_index=True)
+    return pd.concat(aligned_dfs, ignore_index=True, sort=False)
 
-def prompt_for_output_file() -> str:
+def prompt_for_output_file(output_format: str = 'csv') -> str:
     """
-    Prompt user for output CSV file name
+    Prompt user for output file name
     
+    Args:
+        output_format: Output format, used for the default name and extension
+        
     Returns:
         Output file path
     """
-    print("\nEnter the name for the output CSV file")
-    print("Press Enter to use default 'json_output.csv'")
+    extension = f".{output_format}"
+    default_file = f"json_output{extension}"
+    
+    print(f"\nEnter the name for the output {output_format.upper()} file")
+    print(f"Press Enter to use default '{default_file}'")
     
     user_input = input("> ").strip()
     
     if not user_input:
-        return 'json_output.csv'
+        return default_file
     
-    # Add .csv extension if not provided
-    if not user_input.endswith('.csv'):
-        user_input += '.csv'
+    # Add extension if not provided
+    if not user_input.endswith(extension):
+        user_input += extension
     
     return user_input
 
+def stringify_mixed_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Turn object columns pyarrow can't give a single type into text
+    
+    Files merged by combine_dataframes can disagree on a field's type (an id
+    that is a number in one file and a string in another), and lists or
+    dicts left in a column rarely share one structure. CSV writes all of
+    these as text anyway, but pyarrow needs one type per column.
+    
+    Args:
+        df: DataFrame to convert
+        
+    Returns:
+        The DataFrame with those columns as strings, missing values left as is
+    """
+    mixed_columns = []
+    for col in df.columns:
+        if df[col].dtype == object:
+            value_types = set(df[col].dropna().map(type))
+            if len(value_types) > 1 or value_types & {list, dict}:
+                mixed_columns.append(col)
+    if not mixed_columns:
+        return df
+    
+    logger.warning(f"Writing {len(mixed_columns)} columns with mixed or nested values as text: {', '.join(map(str, mixed_columns))}")
+    df = df.copy()
+    for col in mixed_columns:
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+def write_output(df: pd.DataFrame, output_file: str, output_format: str = 'csv') -> None:
+    """
+    Write the DataFrame in the requested format
+    
+    Args:
+        df: DataFrame to write
+        output_file: Destination file path
+        output_format: One of OUTPUT_FORMATS
+    """
+    if output_format != 'csv':
+        df = stringify_mixed_columns(df)
+    
+    if output_format == 'parquet':
+        df.to_parquet(output_file, engine='pyarrow', compression='zstd', index=False)
+    elif output_format == 'feather':
+        df.to_feather(output_file, compression='lz4')
+    else:
+        df.to_csv(output_file, index=False)
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parse command line arguments
+    
+    Returns:
+        Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Convert JSON files in the current directory to a table")
+    parser.add_argument(
+        '--format',
+        choices=OUTPUT_FORMATS,
+        default='csv',
+        help="Output file format (parquet and feather require pyarrow)"
+    )
+    return parser.parse_args()
+
 def main():
-    logger.info("Starting JSON to CSV conversion")
+    args = parse_args()
+    logger.info(f"Starting JSON to {args.format.upper()} conversion")
     
     # Get JSON files in current directory
     available_files = get_json_files_in_current_dir()
@@ -399,11 +591,17 @@ def main():
     # Display fields in columns
     col_width = max(len(field) for field in combined_df.columns) + 2
     columns_per_row = 3
-    for i in range(0, len(combined_df.columns), columns_per_row):
-        row_fields = combined_df.columns[i:i+columns_per_row]
-        print("  " + "".join(field.ljust(col_width) for field in row_fields))
+    cell = "{:<%d}" % col_width
+    row_format = "  " + cell * columns_per_row
+    fields = combined_df.columns.tolist()
+    for i in range(0, len(fields), columns_per_row):
+        row_fields = fields[i:i+columns_per_row]
+        if len(row_fields) == columns_per_row:
+            print(row_format.format(*row_fields))
+        else:
+            print(("  " + cell * len(row_fields)).format(*row_fields))
     
-    print("\nEnter the fields you want to include in the CSV (comma-separated)")
+    print(f"\nEnter the fields you want to include in the {args.format.upper()} file (comma-separated)")
     print("Press Enter to include all fields")
     
     user_input = input("> ").strip()
@@ -423,14 +621,14 @@ def main():
         combined_df = combined_df[valid_fields]
     
     # Prompt for output file
-    output_file = prompt_for_output_file()
+    output_file = prompt_for_output_file(args.format)
     
-    # Export to CSV
+    # Export in the requested format
     try:
-        combined_df.to_csv(output_file, index=False)
-        logger.info(f"Successfully created CSV file with {len(combined_df)} rows: {output_file}")
+        write_output(combined_df, output_file, args.format)
+        logger.info(f"Successfully created {args.format.upper()} file with {len(combined_df)} rows: {output_file}")
     except Exception as e:
-        logger.error(f"Error creating CSV file: {e}")
+        logger.error(f"Error creating {args.format.upper()} file: {e}")
         return
 
 if __name__ == "__main__":